@@ -1,47 +1,41 @@
-import requests
-import os
-from dotenv import load_dotenv
-
-# Load API keys from .env file
-load_dotenv()
-COPPER_API_TOKEN = os.getenv("COPPER_API_TOKEN")
-COPPER_EMAIL = os.getenv("COPPER_EMAIL")
-
-# Copper API settings
-COPPER_API_URL = "https://api.copper.com/developer_api/v1"
-HEADERS = {
-    "X-PW-AccessToken": COPPER_API_TOKEN,
-    "X-PW-UserEmail": COPPER_EMAIL,
-    "X-PW-Application": "developer_api",
-    "Content-Type": "application/json"
-}
+from copper_client import configure_logging, fetch_activities
+
+# Shared stand-in for activities without a parent, so the loop doesn't allocate one per record
+_EMPTY = {}
+
+# The shared activity page holds 100 records for customfields.py; this report lists the latest 25
+RECENT_ACTIVITY_COUNT = 25
+
+# Function to print activity logs
+def print_activity_logs(activities):
+    if not activities:
+        print("No recent activities found.")
+        return
+
+    print("\nRecent Activity Logs:")
+    for activity in activities:
+        get = activity.get
+        parent = get('parent') or _EMPTY
+        print(f"- Type: {get('type', 'Unknown')} | "
+              f"Parent Type: {parent.get('type', 'N/A')} | "
+              f"Parent ID: {parent.get('id', 'N/A')} | "
+              f"Date: {get('activity_date', 'Unknown')}")
+
+# Function to fetch the most recent activity logs without printing them
+def get_recent_activities():
+    activities = fetch_activities()
+    return activities[:RECENT_ACTIVITY_COUNT] if activities is not None else None
 
 # Function to fetch activity logs
 def fetch_activity_logs():
-    payload = {
-        "page_size": 25,  # Fetch recent 25 activities
-        "full_result": True  # Improve search performance
-    }
-
-    response = requests.post(f"{COPPER_API_URL}/activities/search", headers=HEADERS, json=payload)
-
-    if response.status_code == 200:
-        activities = response.json()
-        if not activities:
-            print("No recent activities found.")
-            return []
-
-        print("\nRecent Activity Logs:")
-        for activity in activities:
-            print(f"- Type: {activity.get('type', 'Unknown')} | "
-                  f"Parent Type: {activity.get('parent', {}).get('type', 'N/A')} | "
-                  f"Parent ID: {activity.get('parent', {}).get('id', 'N/A')} | "
-                  f"Date: {activity.get('activity_date', 'Unknown')}")
+    activities = get_recent_activities()
 
+    if activities is not None:
+        print_activity_logs(activities)
         return activities
     else:
-        print("Error fetching activity logs:", response.text)
         return []
 
-# Run the function
-fetch_activity_logs()
+if __name__ == "__main__":
+    configure_logging()
+    fetch_activity_logs()
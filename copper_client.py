@@ -0,0 +1,146 @@
+import orjson
+import logging
+import threading
+import time
+from functools import lru_cache, partial
+from requests.adapters import HTTPAdapter
+from requests_cache import CachedSession
+from urllib3.util.retry import Retry
+import os
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+def configure_logging():
+    """Report errors through logging on stderr, keeping stdout for the scripts' output.
+
+    Called from the scripts' __main__ blocks, so importing this module leaves the
+    importer's logging setup alone.
+    """
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+# Load API keys from .env file
+load_dotenv()
+COPPER_API_TOKEN = os.getenv("COPPER_API_TOKEN")
+COPPER_EMAIL = os.getenv("COPPER_EMAIL")
+
+# Copper API settings
+COPPER_API_URL = "https://api.copper.com/developer_api/v1"
+HEADERS = {
+    "X-PW-AccessToken": COPPER_API_TOKEN,
+    "X-PW-UserEmail": COPPER_EMAIL,
+    "X-PW-Application": "developer_api",
+    "Content-Type": "application/json"
+}
+
+# Copper allows 180 requests per minute per user; stay just under it
+RATE_LIMIT_PER_SECOND = 2.5
+RATE_LIMIT_BURST = 5
+
+class RateLimiter:
+    """Token bucket that paces calls to `rate` per second, allowing bursts of up to `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                time.sleep((1 - self._tokens) / self.rate)
+                self._updated = time.monotonic()
+                self._tokens = 1
+            self._tokens -= 1
+
+class RateLimitedAdapter(HTTPAdapter):
+    """HTTPAdapter that waits for the rate limiter before each request goes on the wire.
+
+    Responses served from the cache never reach the adapter, so they don't use up tokens.
+    """
+
+    def __init__(self, limiter, **kwargs):
+        self.limiter = limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        self.limiter.acquire()
+        return super().send(request, **kwargs)
+
+LIMITER = RateLimiter(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+
+# How long a cached Copper response is served without going back to the network
+CACHE_EXPIRE_SECONDS = 30
+
+# The cache file lives next to this module, whichever directory the scripts are run from
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "copper_cache")
+
+# One keep-alive connection pool shared by every helper script, so running them
+# together in one process (see run_all.py) pays for a single TLS handshake.
+# Responses are also cached on disk, keyed on method, URL and JSON body, so repeated
+# runs while iterating skip the network; once an entry expires it is revalidated with
+# Copper's ETag/Last-Modified headers when present. Search POSTs are read-only, so
+# they are cached too. The access token is kept out of the cache key and the cache file.
+SESSION = CachedSession(
+    CACHE_PATH,
+    backend="sqlite",
+    expire_after=CACHE_EXPIRE_SECONDS,
+    allowable_methods=("GET", "POST"),
+    ignored_parameters=("X-PW-AccessToken",)
+)
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", RateLimitedAdapter(
+    LIMITER,
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 502, 503, 504],
+        allowed_methods=["GET", "POST"],  # Copper's search endpoints are read-only POSTs
+        raise_on_status=False
+    )
+))
+
+# Search endpoints bound to the session once, so call sites only pass the payload
+SEARCH_ACTIVITIES = partial(SESSION.post, f"{COPPER_API_URL}/activities/search")
+SEARCH_LEADS = partial(SESSION.post, f"{COPPER_API_URL}/leads/search")
+
+def response_excerpt(response, limit=512):
+    """Decode at most `limit` bytes of a response body for error messages.
+
+    Unlike response.text this skips charset detection over the whole body, and it keeps
+    large HTML error pages out of the logs.
+    """
+    return response.content[:limit].decode("utf-8", "replace")
+
+_activities_lock = threading.Lock()
+
+@lru_cache(maxsize=None)
+def _search_activities(page_size):
+    payload = {
+        "page_size": page_size,
+        "full_result": True  # Improve search performance
+    }
+    response = SEARCH_ACTIVITIES(json=payload)
+    if response.status_code == 200:
+        return orjson.loads(response.content)
+    else:
+        logger.error("Error fetching activity logs: %s", response_excerpt(response))
+        return None
+
+def fetch_activities(page_size=100):
+    """Fetch the most recent activities once per run and share the list between callers.
+
+    allfields.py and customfields.py both read from this page instead of each searching
+    Copper separately. The lock makes concurrent callers wait for the first request
+    rather than sending their own.
+    """
+    with _activities_lock:
+        return _search_activities(page_size)
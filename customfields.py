@@ -1,54 +1,81 @@
-import requests
-import os
-from dotenv import load_dotenv
-
-# Load API keys from .env file
-load_dotenv()
-COPPER_API_TOKEN = os.getenv("COPPER_API_TOKEN")
-COPPER_EMAIL = os.getenv("COPPER_EMAIL")
-
-COPPER_API_URL = "https://api.copper.com/developer_api/v1"
-HEADERS = {
-    "X-PW-AccessToken": COPPER_API_TOKEN,
-    "X-PW-UserEmail": COPPER_EMAIL,
-    "X-PW-Application": "developer_api",
-    "Content-Type": "application/json"
-}
+import orjson
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from copper_client import (
+    COPPER_API_URL, SEARCH_ACTIVITIES, SESSION, configure_logging, fetch_activities, response_excerpt
+)
+
+logger = logging.getLogger(__name__)
 
 opportunity_id = 33762876  # The missing opportunity ID
+OPPORTUNITY_URL = f"{COPPER_API_URL}/opportunities/{opportunity_id}"
+OPPORTUNITY_ACTIVITY_COUNT = 10  # The latest 10 activities related to this opportunity
 
 def get_opportunity_details():
     """Fetch details of the opportunity."""
-    response = requests.get(f"{COPPER_API_URL}/opportunities/{opportunity_id}", headers=HEADERS)
+    response = SESSION.get(OPPORTUNITY_URL)
     if response.status_code == 200:
-        return response.json()
+        return orjson.loads(response.content)
     else:
-        print("Opportunity not found:", response.text)
+        logger.error("Opportunity not found: %s", response_excerpt(response))
         return None
 
-def get_activity_logs():
-    """Fetch activity logs related to the missing opportunity."""
+def search_opportunity_activities():
+    """Ask Copper for the opportunity's own latest activities."""
     payload = {
         "parent": {"id": opportunity_id, "type": "opportunity"},
-        "page_size": 10  # Fetch the latest 10 activities related to this opportunity
+        "page_size": OPPORTUNITY_ACTIVITY_COUNT
     }
-    response = requests.post(f"{COPPER_API_URL}/activities/search", headers=HEADERS, json=payload)
+    response = SEARCH_ACTIVITIES(json=payload)
     if response.status_code == 200:
-        return response.json()
+        return orjson.loads(response.content)
     else:
-        print("Error fetching activity logs:", response.text)
+        logger.error("Error fetching activity logs: %s", response_excerpt(response))
         return None
 
-# Fetch opportunity details
-opportunity_data = get_opportunity_details()
-if opportunity_data:
-    print("\n--- Opportunity Details ---")
-    print(opportunity_data)
+def get_activity_logs():
+    """Fetch activity logs related to the missing opportunity."""
+    activities = fetch_activities()
+    if activities is not None:
+        # Filter the shared recent-activity page in-process first
+        opportunity_activities = [
+            activity for activity in activities
+            if (activity.get("parent") or {}).get("type") == "opportunity"
+            and (activity.get("parent") or {}).get("id") == opportunity_id
+        ]
+        if len(opportunity_activities) >= OPPORTUNITY_ACTIVITY_COUNT:
+            return opportunity_activities[:OPPORTUNITY_ACTIVITY_COUNT]
+
+    # The shared page only covers the account's most recent activities, so it usually misses
+    # most of this opportunity's - fall back to a search filtered on the opportunity
+    logger.info("Shared activity page has fewer than %d activities for opportunity %s, searching by parent",
+                OPPORTUNITY_ACTIVITY_COUNT, opportunity_id)
+    return search_opportunity_activities()
+
+def fetch_opportunity_report():
+    """Fetch the opportunity's details and its recent activity logs."""
+    # Fetch opportunity details and its activity logs concurrently - the two calls are independent
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        opportunity_future = executor.submit(get_opportunity_details)
+        activity_future = executor.submit(get_activity_logs)
+    return opportunity_future.result(), activity_future.result()
+
+def print_opportunity_report(opportunity_data, activity_logs):
+    """Print the opportunity's details and its recent activity logs."""
+    if opportunity_data:
+        print("\n--- Opportunity Details ---")
+        print(opportunity_data)
+
+    if activity_logs:
+        print("\n--- Recent Activity Logs for Opportunity ---")
+        for activity in activity_logs:
+            print(f"- Type: {activity.get('type')}, Name: {activity.get('name')}, Date: {activity.get('activity_date')}")
 
-# Fetch activity logs related to the opportunity
-activity_logs = get_activity_logs()
-if activity_logs:
-    print("\n--- Recent Activity Logs for Opportunity ---")
-    for activity in activity_logs:
-        print(f"- Type: {activity.get('type')}, Name: {activity.get('name')}, Date: {activity.get('activity_date')}")
+def main():
+    """Print the opportunity's details and its recent activity logs."""
+    print_opportunity_report(*fetch_opportunity_report())
 
+if __name__ == "__main__":
+    configure_logging()
+    main()
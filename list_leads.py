@@ -1,30 +1,24 @@
-import os
+import sys
+import logging
 import requests
-import json
-from datetime import datetime
-from dotenv import load_dotenv
+import orjson
+from time import strftime as _strftime, localtime as _localtime
 
-# Load environment variables from .env file
-load_dotenv()
+from copper_client import SEARCH_LEADS, configure_logging, response_excerpt
 
-# Copper API configuration
-BASE_URL = "https://api.copper.com/developer_api/v1"
-HEADERS = {
-    "X-PW-AccessToken": os.getenv("COPPER_API_TOKEN"),
-    "X-PW-Application": "developer_api",
-    "X-PW-UserEmail": os.getenv("COPPER_EMAIL"),
-    "Content-Type": "application/json"
-}
+logger = logging.getLogger(__name__)
 
-def fetch_recent_leads():
+# Timestamp fields on Copper lead records, formatted as readable dates in the report
+DATE_FIELDS = frozenset(("date_created", "date_modified", "date_last_contacted"))
+_DATE_FMT = '%Y-%m-%d %H:%M:%S'
+
+def get_recent_leads():
     """
-    Fetch the 3 most recent leads from Copper CRM
+    Fetch the 3 most recent leads from Copper CRM without printing them
     """
     try:
         # Use the search endpoint to get leads sorted by creation date
-        response = requests.post(
-            f"{BASE_URL}/leads/search",
-            headers=HEADERS,
+        response = SEARCH_LEADS(
             json={
                 "page_size": 3,  # Limit to 3 results
                 "sort_by": "date_created",  # Sort by creation date
@@ -36,51 +30,64 @@ def fetch_recent_leads():
         response.raise_for_status()
         
         # Parse response JSON
-        leads = response.json()
-        
-        if leads and len(leads) > 0:
-            print(f"Found {len(leads)} recent leads:")
-            
-            # Display the leads with ALL information
-            for i, lead in enumerate(leads, 1):
-                print(f"\n{'='*50}")
-                print(f"LEAD {i} - COMPLETE DETAILS")
-                print(f"{'='*50}")
-                
-                # Print all fields in a readable format
-                for field, value in lead.items():
-                    # Format timestamps as readable dates
-                    if field.startswith('date_') and isinstance(value, (int, float)):
-                        formatted_value = datetime.fromtimestamp(value).strftime('%Y-%m-%d %H:%M:%S')
-                        print(f"{field}: {formatted_value}")
-                    # Format nested dictionaries and lists with indentation
-                    elif isinstance(value, (dict, list)):
-                        print(f"{field}:")
-                        print(json.dumps(value, indent=4))
-                    # Print other values normally
-                    else:
-                        print(f"{field}: {value}")
-            
-            return leads
-        else:
-            print("No leads found.")
-            return []
+        return orjson.loads(response.content) or []
             
     except requests.exceptions.HTTPError as http_err:
-        print(f"HTTP Error occurred: {http_err}")
-        print(f"Response: {response.text}")
+        logger.error("HTTP Error occurred: %s", http_err)
+        logger.error("Response: %s", response_excerpt(response))
     except requests.exceptions.ConnectionError as conn_err:
-        print(f"Connection Error occurred: {conn_err}")
+        logger.error("Connection Error occurred: %s", conn_err)
     except requests.exceptions.Timeout as timeout_err:
-        print(f"Timeout Error occurred: {timeout_err}")
+        logger.error("Timeout Error occurred: %s", timeout_err)
     except requests.exceptions.RequestException as req_err:
-        print(f"Request Exception occurred: {req_err}")
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+        logger.error("Request Exception occurred: %s", req_err)
+    except Exception:
+        logger.exception("An unexpected error occurred")
     
     return None
 
+def print_recent_leads(leads):
+    """
+    Print every field of the given leads
+    """
+    if leads:
+        # Build the whole report first and write it to stdout in one go
+        parts = [f"Found {len(leads)} recent leads:\n"]
+        
+        # Display the leads with ALL information
+        for i, lead in enumerate(leads, 1):
+            parts.append(f"\n{'='*50}\n")
+            parts.append(f"LEAD {i} - COMPLETE DETAILS\n")
+            parts.append(f"{'='*50}\n")
+            
+            # Print all fields in a readable format
+            for field, value in lead.items():
+                # Format timestamps as readable dates
+                if field in DATE_FIELDS and isinstance(value, (int, float)):
+                    formatted_value = _strftime(_DATE_FMT, _localtime(value))
+                    parts.append(f"{field}: {formatted_value}\n")
+                # Format nested dictionaries and lists with indentation
+                elif isinstance(value, (dict, list)):
+                    parts.append(f"{field}:\n{orjson.dumps(value, option=orjson.OPT_INDENT_2).decode()}\n")
+                # Print other values normally
+                else:
+                    parts.append(f"{field}: {value}\n")
+        
+        sys.stdout.write("".join(parts))
+    else:
+        print("No leads found.")
+
+def fetch_recent_leads():
+    """
+    Fetch the 3 most recent leads from Copper CRM and print them
+    """
+    leads = get_recent_leads()
+    if leads is not None:
+        print_recent_leads(leads)
+    return leads
+
 if __name__ == "__main__":
+    configure_logging()
     print("Fetching the 3 most recent leads from Copper CRM...")
     fetch_recent_leads()
     print("\nDone!")
\ No newline at end of file
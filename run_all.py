@@ -0,0 +1,25 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from copper_client import configure_logging
+from allfields import get_recent_activities, print_activity_logs
+from customfields import get_opportunity_details, get_activity_logs, print_opportunity_report
+from list_leads import get_recent_leads, print_recent_leads
+
+def run_all():
+    """Run every helper script's Copper fetch concurrently over the shared session, then print
+    the reports in script order once all of them are in, so their output doesn't interleave."""
+    fetches = (get_recent_activities, get_opportunity_details, get_activity_logs, get_recent_leads)
+    with ThreadPoolExecutor(max_workers=len(fetches)) as executor:
+        futures = [executor.submit(fetch) for fetch in fetches]
+    activities, opportunity_data, activity_logs, leads = results = [future.result() for future in futures]
+
+    if activities is not None:
+        print_activity_logs(activities)
+    print_opportunity_report(opportunity_data, activity_logs)
+    if leads is not None:
+        print_recent_leads(leads)
+    return results
+
+if __name__ == "__main__":
+    configure_logging()
+    run_all()
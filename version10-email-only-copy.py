@@ -9,6 +9,10 @@ st.set_page_config(
 )
 
 import requests
+import orjson
+import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
 import json
 import smtplib
@@ -19,6 +23,11 @@ from datetime import datetime, timedelta
 import re
 import html
 import time
+import itertools
+import threading
+from types import MappingProxyType
+import concurrent.futures
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # Configure logging first
 logging.basicConfig(level=logging.INFO)
@@ -45,6 +54,9 @@ EMAIL_ADDRESS = get_secret('EMAIL_ADDRESS', '')
 EMAIL_PASSWORD = get_secret('EMAIL_PASSWORD', '')
 SMTP_SERVER = get_secret('SMTP_SERVER', 'smtp.gmail.com')
 SMTP_PORT = int(get_secret('SMTP_PORT', '587'))
+# smtplib protocol tracing prints every command (AUTH included) to stderr - only enable it when
+# SMTP_DEBUG is explicitly set to 1/true/yes (a TOML boolean true also counts)
+SMTP_DEBUG = str(get_secret('SMTP_DEBUG', '')).strip().lower() in ("1", "true", "yes")
 COPPER_API_URL = get_secret('COPPER_API_URL', 'https://api.copper.com/developer_api/v1')
 
 # Log the credentials we're using (with appropriate masking)
@@ -75,19 +87,192 @@ HEADERS = {
     "Content-Type": "application/json"
 }
 
-# Load rejection email templates from JSON file
+# Create one pooled session for all Copper API calls so they reuse keep-alive connections.
+# Streamlit re-executes this script on every rerun, so the session lives in st.cache_resource.
+@st.cache_resource
+def get_copper_session():
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    session.mount("https://", HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            # /leads/search is a read-only POST, so it is safe to retry
+            allowed_methods=["GET", "POST"],
+            raise_on_status=False
+        )
+    ))
+    return session
+
+SESSION = get_copper_session()
+
+# Locations to look for the email templates - the working directory first, then next to this script
+TEMPLATE_PATHS = (
+    "email_templates.json",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "email_templates.json")
+)
+
+# Load rejection email templates from JSON file once per server process.
+# Errors are raised rather than returned so a failed load is retried on the next run.
+@st.cache_resource
+def load_email_templates():
+    path = next((p for p in TEMPLATE_PATHS if os.path.exists(p)), None)
+    if path is None:
+        raise FileNotFoundError(f"email_templates.json not found in: {', '.join(TEMPLATE_PATHS)}")
+    with open(path, "r") as f:
+        templates = json.load(f)
+    logger.info(f"Loaded {len(templates)} email templates from {path}")
+    return templates
+
 try:
-    with open("email_templates.json", "r") as f:
-        EMAIL_TEMPLATES = json.load(f)
-    logger.info(f"Loaded {len(EMAIL_TEMPLATES)} email templates")
+    EMAIL_TEMPLATES = load_email_templates()
 except Exception as e:
     st.error(f"Error loading email templates: {e}")
     logger.error(f"Error loading email templates: {e}")
     EMAIL_TEMPLATES = {}
 
-# Add global caching for lead details and field definitions
-LEAD_DETAILS_CACHE = {}
-FIELD_DEFINITIONS_CACHE = None
+# Create a mapping of form field names to their corresponding custom field definition IDs (read-only)
+FIELD_ID_MAPPING = MappingProxyType({
+    "Number of full time employees": 328938,
+    "How did you hear about us?": 328940,
+    "Year Founded": 328941,
+    "Revenue Model": 328943,
+    "Last year's revenue": 328937,
+    "Amount raised to date": 328950,
+    "Target size of current raise": 328951,
+    "Link to your investor deck": 328958,
+    "Last three months' revenue": 328944,
+    "Value of new sales signed last month": 328946,
+    "Specific environmental impact": 328942,
+    "Number of paid customers": 328945,
+    "Cash on hand": 328948,
+    "Brief Company Description": 328956,  # This appears to be "Biggest concerns" now
+    "Monthly net burn": 328947,
+    "Most impressive points": 328954,
+    "Competitors": 328949,
+    "Most likely exit and timing": 328957,
+    "Biggest concerns": 328953
+})
+
+# Define the exact form fields to display in the specified order
+FIELD_ORDER = [
+    "First Name",
+    "Last Name",
+    "Company Name",
+    "Website",
+    "Email",
+    "HQ Address",
+    "Country",
+    "Address Line 1",
+    "Address Line 2",
+    "City",
+    "Province",
+    "Postal Code",
+    "Year Founded", 
+    "Brief Company Description",
+    "How did you hear about us?",
+    "Specific environmental impact",
+    "Revenue Model",
+    "Last year's revenue",
+    "Last three months' revenue",
+    "Value of new sales signed last month",
+    "Number of full time employees",
+    "Number of paid customers",
+    "Cash on hand",
+    "Monthly net burn",
+    "Amount raised to date",
+    "Target size of current raise",
+    "Link to your investor deck"
+]
+
+# Rejection reasons offered in the email draft, keyed by email template name
+REASON_OPTIONS = MappingProxyType({
+    "hardware": "Hardware (Pre-commercial or CapEx Intensive)",
+    "too_early": "Too Early but Could Be a Future Fit",
+    "geography": "Geography",
+    "too_far_along": "Too Far Along",
+    "not_enough_impact": "Not Enough Impact",
+    "competitive": "Competitive with Portfolio Companies",
+    "general": "General Pass"
+})
+REASON_KEYS = tuple(REASON_OPTIONS)
+REASON_INDEX = MappingProxyType({reason: index for index, reason in enumerate(REASON_KEYS)})
+
+# Patterns and fields that mark a lead as coming from the website form
+_FORM_TAG_RE = re.compile(r"form", re.I)
+_SOURCE_RE = re.compile(r"form|website|submission", re.I)
+# The custom "Source" field has only ever matched form or website, not submission
+_SOURCE_FIELD_RE = re.compile(r"form|website", re.I)
+FORM_INDICATOR_FIELDS = ("Revenue Model", "Last year's revenue", "Number of full time employees")
+
+# Custom CSS for better styling
+APP_CSS = """
+    <style>
+    .days-in-copper {
+        color: #FF4B4B;
+        font-weight: bold;
+    }
+    .form-submission {
+        color: #0068C9;
+        font-weight: bold;
+    }
+    .manual-entry {
+        color: #83C9FF;
+        font-weight: bold;
+    }
+    .lead-header {
+        font-size: 16px;
+        font-weight: bold;
+    }
+    .custom-field-name {
+        font-weight: bold;
+        color: #555555;
+    }
+    .custom-field-value {
+        margin-left: 10px;
+    }
+    .section-divider {
+        margin-top: 20px;
+        margin-bottom: 20px;
+        border-bottom: 1px solid #EEEEEE;
+    }
+    .email-format {
+        font-family: Arial, sans-serif;
+        line-height: 1.5;
+        padding: 10px;
+        background-color: #f9f9f9;
+        border-radius: 5px;
+        border-left: 3px solid #0068C9;
+    }
+    .email-format p {
+        margin: 5px 0;
+    }
+    .email-label {
+        font-weight: bold;
+    }
+    </style>
+    """
+
+# Lead keys the app reads - everything else in Copper's lead payload is dropped before caching
+LEAD_FIELDS = (
+    "id", "name", "first_name", "last_name", "company_name",
+    "date_created", "date_modified", "email", "emails", "contact_info",
+    "phone_number", "website", "websites", "address",
+    "custom_fields", "tags", "source", "details", "description"
+)
+
+# Maximum page size accepted by Copper's search endpoints
+LEADS_PAGE_SIZE = 200
+
+# Number of leads rendered per page in the app
+LEADS_PER_PAGE = 15
+
+# Function to emit the app CSS - Streamlit rebuilds the page on every rerun, so this runs each time
+def _inject_css():
+    st.markdown(APP_CSS, unsafe_allow_html=True)
 
 # Function to test email connection with detailed error reporting
 def test_email_connection():
@@ -98,7 +283,8 @@ def test_email_connection():
     try:
         logger.info(f"Attempting to connect to {SMTP_SERVER}:{SMTP_PORT}")
         server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.set_debuglevel(1)  # Enable debug output
+        if SMTP_DEBUG:
+            server.set_debuglevel(1)  # Enable debug output
         server.starttls()
         
         logger.info(f"Attempting to login with email: {EMAIL_ADDRESS}")
@@ -116,89 +302,154 @@ def test_email_connection():
         return False, error_msg
 
 # Function to fetch leads from Copper CRM with detailed error reporting
+# Cached across reruns and sessions so widget interactions don't page through Copper again;
+# errors are raised so failures are never cached. "Refresh Leads" clears it.
+@st.cache_data(ttl=5*60, show_spinner=False)
 def fetch_leads():
-    """Fetch leads from Copper CRM with detailed error reporting."""
+    """Fetch leads from Copper CRM with detailed error reporting.
+    
+    Pages through POST /leads/search, which returns full lead records including
+    custom fields, so opening a lead doesn't need a separate per-lead request.
+    """
     try:
         logger.info("Attempting to fetch leads from Copper")
         logger.info(f"Using API URL: {COPPER_API_URL}")
-        logger.info(f"Using headers: {HEADERS}")
-        
-        response = requests.get(
-            f"{COPPER_API_URL}/leads/search",
-            headers=HEADERS,
-            timeout=30
-        )
-        
-        logger.info(f"Response status code: {response.status_code}")
-        logger.info(f"Response headers: {response.headers}")
+        # Header names only - the values include the API token
+        logger.debug("Using headers: %s", list(HEADERS))
         
-        if response.status_code == 401:
-            logger.error("Authentication failed with Copper API")
-            return {"error": "authentication error"}
-        elif response.status_code != 200:
-            logger.error(f"Error response from Copper: {response.text}")
-            return {"error": f"API error: {response.status_code}"}
+        leads = []
+        page_number = 1
+        while True:
+            response = SESSION.post(
+                f"{COPPER_API_URL}/leads/search",
+                params={"custom_field_computed_values": "true"},
+                json={
+                    "page_size": LEADS_PAGE_SIZE,
+                    "page_number": page_number,
+                    "sort_by": "date_created",
+                    "sort_direction": "desc"
+                },
+                timeout=30
+            )
+            
+            logger.info(f"Response status code: {response.status_code}")
+            logger.debug("Response headers: %s", response.headers)
+            
+            if response.status_code == 401:
+                logger.error("Authentication failed with Copper API")
+                raise RuntimeError("authentication error")
+            elif response.status_code != 200:
+                logger.error(f"Error response from Copper: {response.text}")
+                raise RuntimeError(f"API error: {response.status_code}")
             
-        return response.json()
+            page = orjson.loads(response.content)
+            leads.extend(index_custom_fields(slim_lead(lead)) for lead in page)
+            if len(page) < LEADS_PAGE_SIZE:
+                break
+            page_number += 1
+        
+        logger.info(f"Fetched {len(leads)} leads in {page_number} page(s)")
+        return leads
     except requests.exceptions.RequestException as e:
         logger.error(f"Request error: {str(e)}")
-        return {"error": str(e)}
-    except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}")
-        return {"error": str(e)}
+        raise
 
 # Function to fetch custom field definitions from Copper
+# Definitions rarely change, so they are cached across reruns and sessions for a day.
+# Errors are raised rather than returned so a failed fetch is never cached.
+@st.cache_data(ttl=24*3600, show_spinner=False)
 def fetch_custom_field_definitions():
-    global FIELD_DEFINITIONS_CACHE
-    
-    # Return cached definitions if available
-    if FIELD_DEFINITIONS_CACHE is not None:
-        return FIELD_DEFINITIONS_CACHE
+    response = SESSION.get(f"{COPPER_API_URL}/custom_field_definitions", timeout=30)
     
-    response = requests.get(f"{COPPER_API_URL}/custom_field_definitions", headers=HEADERS)
-    
-    if response.status_code == 200:
-        definitions = response.json()
-        logger.info(f"Successfully fetched {len(definitions)} custom field definitions from Copper")
-        
-        # Create a dictionary mapping definition IDs to names
-        definition_map = {}
-        for definition in definitions:
-            definition_map[definition.get("id")] = definition.get("name")
-        
-        # Store in global cache
-        FIELD_DEFINITIONS_CACHE = definition_map
-        return definition_map
-    else:
+    if response.status_code != 200:
         error_msg = f"Error fetching custom field definitions: {response.text}"
-        st.error(error_msg)
         logger.error(error_msg)
-        return {}
+        raise RuntimeError(error_msg)
+    
+    definitions = response.json()
+    logger.info(f"Successfully fetched {len(definitions)} custom field definitions from Copper")
+    return definitions
+
+# Read-only map of custom field definition IDs to names, built once per process and shared
+# by all sessions. Expires with the definitions it is built from.
+@st.cache_resource(ttl=24*3600)
+def get_field_definition_names():
+    return MappingProxyType({
+        definition.get("id"): definition.get("name")
+        for definition in fetch_custom_field_definitions()
+    })
 
 # Function to fetch lead details
+# Cached per lead ID across reruns and sessions; errors are raised so failures are never cached.
+@st.cache_data(ttl=15*60, max_entries=2000, show_spinner=False)
 def fetch_lead_details(lead_id):
-    global LEAD_DETAILS_CACHE
-    
-    # Return cached details if available
-    if lead_id in LEAD_DETAILS_CACHE:
-        return LEAD_DETAILS_CACHE[lead_id]
-    
     # Add the custom_field_computed_values=true parameter to get actual values for dropdown fields
-    response = requests.get(f"{COPPER_API_URL}/leads/{lead_id}?custom_field_computed_values=true", headers=HEADERS)
+    response = SESSION.get(f"{COPPER_API_URL}/leads/{lead_id}?custom_field_computed_values=true", timeout=30)
 
-    if response.status_code == 200:
-        lead_details = response.json()
-        logger.info(f"Successfully fetched details for lead ID: {lead_id}")
-        
-        # Store in global cache
-        LEAD_DETAILS_CACHE[lead_id] = lead_details
-        return lead_details
-    else:
+    if response.status_code != 200:
         error_msg = f"Error fetching lead details: {response.text}"
-        st.error(error_msg)
         logger.error(error_msg)
+        raise RuntimeError(error_msg)
+    
+    logger.info(f"Successfully fetched details for lead ID: {lead_id}")
+    return index_custom_fields(slim_lead(orjson.loads(response.content)))
+
+# Function to get lead details, reporting fetch errors in the UI
+def get_lead_details(lead_id):
+    try:
+        return fetch_lead_details(lead_id)
+    except Exception as e:
+        st.error(str(e))
         return {}
 
+# Sentinel for an absent key - computed_value can legitimately be None
+_MISSING = object()
+
+# Function to get a custom field's display value
+def _field_value(field):
+    # Use computed_value if available, otherwise fall back to value
+    computed_value = field.get("computed_value", _MISSING)
+    if computed_value is _MISSING:
+        return field.get("value", "")
+    # If computed_value is a list, join it with commas
+    if isinstance(computed_value, list):
+        return ", ".join(map(str, computed_value))
+    return computed_value
+
+# Function to keep only the lead keys the app uses, with the recipient address resolved once
+def slim_lead(lead):
+    slim = {key: lead[key] for key in LEAD_FIELDS if key in lead}
+    slim["_email"] = get_email_from_lead(slim)
+    return slim
+
+# Function to index a lead's custom fields once so lookups don't rescan the list.
+# Copper keys custom field values by definition ID; names are only indexed when present.
+def index_custom_fields(lead_details):
+    custom_fields = lead_details.get("custom_fields", [])
+    if isinstance(custom_fields, list):
+        cf_by_id = {}
+        cf_by_name = {}
+        field_by_id = {}
+        has_data = False
+        for field in custom_fields:
+            if isinstance(field, dict):
+                field_def_id = field.get("custom_field_definition_id")
+                cf_by_id[field_def_id] = field
+                if field.get("name"):
+                    cf_by_name[field.get("name")] = field
+                if field.get("value") is not None and field.get("value") != "":
+                    has_data = True
+                
+                # Display value for the form details view
+                if field_def_id:
+                    field_by_id[field_def_id] = _field_value(field)
+        lead_details["_cf_by_id"] = cf_by_id
+        lead_details["_cf_by_name"] = cf_by_name
+        lead_details["_field_by_id"] = field_by_id
+        # Same check as has_form_data(), done in this pass so renders don't rescan the list
+        lead_details["_has_form_data"] = has_data
+    return lead_details
+
 # Function to safely extract custom field values from Copper CRM data
 def get_custom_field(lead_details, field_name):
     custom_fields = lead_details.get("custom_fields", [])
@@ -207,16 +458,18 @@ def get_custom_field(lead_details, field_name):
         return ""
 
     if isinstance(custom_fields, list):
-        for field in custom_fields:
-            if isinstance(field, dict) and field.get("name") == field_name:
-                # Use computed_value if available, otherwise fall back to value
-                if "computed_value" in field:
-                    computed_value = field.get("computed_value")
-                    # If computed_value is a list, join it with commas
-                    if isinstance(computed_value, list):
-                        return ", ".join(str(item) for item in computed_value)
-                    return computed_value
-                return field.get("value", "")  
+        # Index once per lead if fetch time didn't already
+        if "_cf_by_id" not in lead_details:
+            index_custom_fields(lead_details)
+        # Look up by definition ID; fall back to the name for fields outside FIELD_ID_MAPPING
+        field_id = FIELD_ID_MAPPING.get(field_name)
+        if field_id is not None:
+            field = lead_details["_cf_by_id"].get(field_id)
+        else:
+            field = lead_details["_cf_by_name"].get(field_name)
+        if field is None:
+            return ""
+        return _field_value(field)
 
     elif isinstance(custom_fields, dict):
         return custom_fields.get(field_name, "")
@@ -235,6 +488,12 @@ def get_sender_name(email):
     except:
         return "Active Impact"
 
+# Sender's first name for signatures - EMAIL_ADDRESS doesn't change while the app runs
+SENDER_NAME = get_sender_name(EMAIL_ADDRESS)
+
+# Placeholders filled in the templates - any other braces in the user-edited templates are left as they are
+_TEMPLATE_FIELD_RE = re.compile(r"\{(lead_name|company_name|sender_name)\}")
+
 def generate_rejection_email(lead_data, template_type="standard"):
     """Generate rejection email content based on lead data and template type."""
     try:
@@ -244,61 +503,123 @@ def generate_rejection_email(lead_data, template_type="standard"):
             logger.error(f"Template not found: {template_type}")
             return None
 
-        # Get sender's first name for signature
-        sender_name = get_sender_name(EMAIL_ADDRESS)
-        
-        # Replace placeholders with actual data
-        email_content = template.replace("{lead_name}", lead_data.get("name", ""))
-        email_content = email_content.replace("{company_name}", lead_data.get("company_name", ""))
-        email_content = email_content.replace("{sender_name}", sender_name)
+        # Replace placeholders with actual data in a single pass
+        fields = {
+            "lead_name": lead_data.get("name") or "",
+            "company_name": lead_data.get("company_name") or "",
+            "sender_name": SENDER_NAME
+        }
+        email_content = _TEMPLATE_FIELD_RE.sub(lambda match: fields[match.group(1)], template)
         
         # Add signature
-        email_content += f"\n\nWarmly,\n{sender_name}"
+        email_content += f"\n\nWarmly,\n{SENDER_NAME}"
         
         return email_content
     except Exception as e:
         logger.error(f"Error generating email: {str(e)}")
         return None
 
+# Cached rejection email, keyed on the template and the only lead fields the templates use
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_rejection_email(template_type, lead_name, company_name):
+    return generate_rejection_email({"name": lead_name, "company_name": company_name}, template_type)
+
 # Function to extract email address from lead details
 def get_email_from_lead(lead_details):
+    # Use the address resolved when the lead was fetched
+    if "_email" in lead_details:
+        return lead_details["_email"]
+    
     # Try to get email from the email field
-    email_obj = lead_details.get("email", {})
-    if isinstance(email_obj, dict) and "email" in email_obj:
-        return email_obj.get("email")
+    email_obj = lead_details.get("email")
+    if isinstance(email_obj, dict):
+        email = email_obj.get("email")
+        if email:
+            return email
     
     # If that fails, try to get from emails array
-    emails = lead_details.get("emails", [])
-    if emails and isinstance(emails, list) and len(emails) > 0:
-        for email in emails:
-            if isinstance(email, dict) and "email" in email:
-                return email.get("email")
+    emails = lead_details.get("emails")
+    if isinstance(emails, list):
+        for email_obj in emails:
+            if isinstance(email_obj, dict):
+                email = email_obj.get("email")
+                if email:
+                    return email
     
     # If that fails, try to get from contact info
-    contact_info = lead_details.get("contact_info", {})
-    if isinstance(contact_info, dict) and "email" in contact_info:
-        return contact_info.get("email")
+    contact_info = lead_details.get("contact_info")
+    if isinstance(contact_info, dict):
+        email = contact_info.get("email")
+        if email:
+            return email
     
     return ""
 
-# Function to send email via Gmail SMTP
-def send_email(recipient_email, subject, body, cc_email=None):
-    if not EMAIL_ADDRESS or not EMAIL_PASSWORD:
-        error_msg = "Email credentials not configured. Please check your Streamlit secrets."
-        logger.error(error_msg)
-        return False, error_msg
+# Address keys in the order they appear in the one-line HQ address
+_ADDR_KEYS = ("street", "city", "state", "postal_code", "country")
+
+# Resolvers for the standard (non-custom, non-address) fields in FIELD_ORDER (read-only)
+STD_FIELD_RESOLVERS = MappingProxyType({
+    "First Name": lambda lead_details: lead_details.get("first_name"),
+    "Last Name": lambda lead_details: lead_details.get("last_name"),
+    "Company Name": lambda lead_details: lead_details.get("company_name"),
+    "Website": lambda lead_details: (lead_details.get("websites") or [{}])[0].get("url"),
+    "Email": get_email_from_lead
+})
+
+# Authenticated SMTP connection that can send several messages without reconnecting
+class SmtpClient:
+    """Keep one TLS-authenticated SMTP connection open across sends."""
     
-    if not recipient_email:
-        error_msg = "No recipient email provided"
-        logger.error(error_msg)
-        return False, error_msg
+    def __init__(self):
+        self.server = None
+        # Serialises use of the connection when the client is shared between sessions
+        self.lock = threading.Lock()
     
-    logger.info(f"Attempting to send email to: {recipient_email}")
-    if cc_email:
-        logger.info(f"CC: {cc_email}")
-    logger.info(f"Email subject: {subject}")
+    def connect(self):
+        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
+        if SMTP_DEBUG:
+            server.set_debuglevel(1)  # Enable debug output
+        try:
+            server.starttls()
+            logger.info(f"Attempting to login with email: {EMAIL_ADDRESS}")
+            server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
+        except Exception:
+            server.close()
+            raise
+        self.server = server
+        return self
     
-    try:
+    def ensure_connected(self):
+        # Reuse the open connection if the server still answers, otherwise reconnect
+        if self.server is not None:
+            try:
+                if self.server.noop()[0] == 250:
+                    return self
+            except (smtplib.SMTPException, OSError):
+                pass
+            logger.info("SMTP connection lost, reconnecting")
+            self.close()
+        return self.connect()
+    
+    def close(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            self.server.close()
+        self.server = None
+    
+    def __enter__(self):
+        if self.server is None:
+            self.connect()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def send(self, recipient_email, subject, body, cc_email=None):
         msg = MIMEMultipart()
         msg['From'] = EMAIL_ADDRESS
         msg['To'] = recipient_email
@@ -310,23 +631,59 @@ def send_email(recipient_email, subject, body, cc_email=None):
         
         msg.attach(MIMEText(body, 'plain'))
         
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.set_debuglevel(1)  # Enable debug output
-        server.starttls()
-        
-        logger.info(f"Attempting to login with email: {EMAIL_ADDRESS}")
-        server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-        
-        text = msg.as_string()
-        
         # Determine all recipients (including CC if provided)
         recipients = [recipient_email]
         if cc_email:
             recipients.append(cc_email)
         
         logger.info(f"Sending email from {EMAIL_ADDRESS} to {recipient_email}")
-        server.sendmail(EMAIL_ADDRESS, recipients, text)
-        server.quit()
+        self.server.sendmail(EMAIL_ADDRESS, recipients, msg.as_string())
+
+# One SMTP client kept open across reruns and sessions so sends skip the TLS handshake and login
+@st.cache_resource
+def get_smtp_client():
+    return SmtpClient()
+
+# Bounded pool shared by all sessions that sends emails off the script thread so the UI stays responsive
+@st.cache_resource
+def get_send_pool():
+    return concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="email-send")
+
+# Function to send an email on the shared SMTP client from a send pool thread - returns (success, message)
+# and never touches st, since pool threads have no script run context
+def send_email_with_client(client, recipient_email, subject, body, cc_email=None):
+    try:
+        with client.lock:
+            # Verify the connection first - the shared connection is reused while the server keeps it open
+            client.ensure_connected()
+            return send_email(recipient_email, subject, body, cc_email, client=client)
+    except Exception as e:
+        logger.error(f"Email connection failed during send attempt: {str(e)}")
+        return False, f"Failed to connect to email server: {str(e)}"
+
+# Function to send email via Gmail SMTP, reusing an open SmtpClient when one is passed in
+def send_email(recipient_email, subject, body, cc_email=None, client=None):
+    if not EMAIL_ADDRESS or not EMAIL_PASSWORD:
+        error_msg = "Email credentials not configured. Please check your Streamlit secrets."
+        logger.error(error_msg)
+        return False, error_msg
+    
+    if not recipient_email:
+        error_msg = "No recipient email provided"
+        logger.error(error_msg)
+        return False, error_msg
+    
+    logger.info(f"Attempting to send email to: {recipient_email}")
+    if cc_email:
+        logger.info(f"CC: {cc_email}")
+    logger.info(f"Email subject: {subject}")
+    
+    try:
+        if client is not None:
+            client.send(recipient_email, subject, body, cc_email)
+        else:
+            with SmtpClient() as client:
+                client.send(recipient_email, subject, body, cc_email)
         
         logger.info("Email sent successfully!")
         return True, "Email sent successfully!"
@@ -378,7 +735,8 @@ def format_date(timestamp):
         return "Date format error"
 
 # Function to calculate days in Copper
-def days_in_copper(timestamp):
+# Pass `now` (seconds since the epoch) to share one clock reading across a whole render.
+def days_in_copper(timestamp, now=None):
     if not timestamp:
         return "Unknown"
     try:
@@ -386,11 +744,10 @@ def days_in_copper(timestamp):
         if timestamp > 1000000000000:  # If timestamp is in milliseconds
             timestamp = timestamp / 1000
         
-        created_date = datetime.fromtimestamp(timestamp)
-        current_date = datetime.now()
-        days = (current_date - created_date).days
+        if now is None:
+            now = time.time()
         
-        return days
+        return int((now - timestamp) // 86400)
     except Exception as e:
         logger.error(f"Error calculating days in Copper: {e}")
         return "Unknown"
@@ -401,31 +758,32 @@ def get_lead_source(lead_details):
     
     # Check if there's a form submission tag
     tags = lead_details.get("tags", [])
-    if any("form" in tag.lower() for tag in tags):
+    if any(_FORM_TAG_RE.search(tag) for tag in tags):
         return "Form Submission"
     
     # Check if there's a form submission in the source field
     source = lead_details.get("source", {})
     if isinstance(source, dict) and source.get("name"):
-        source_name = source.get("name", "").lower()
-        if "form" in source_name or "website" in source_name or "submission" in source_name:
+        if _SOURCE_RE.search(source.get("name")):
             return "Form Submission"
     
     # Check custom fields for source information
     source_info = get_custom_field(lead_details, "Source")
-    if source_info and ("form" in source_info.lower() or "website" in source_info.lower()):
+    if source_info and _SOURCE_FIELD_RE.search(source_info):
         return "Form Submission"
     
     # Check if lead has many filled custom fields (likely from a form)
     custom_fields = lead_details.get("custom_fields", [])
     if isinstance(custom_fields, list) and len(custom_fields) > 5:
-        filled_fields = sum(1 for field in custom_fields if isinstance(field, dict) and field.get("value"))
-        if filled_fields > 5:  # If more than 5 custom fields are filled, likely a form submission
-            return "Form Submission"
+        filled_fields = 0
+        for field in custom_fields:
+            if isinstance(field, dict) and field.get("value"):
+                filled_fields += 1
+                if filled_fields > 5:  # If more than 5 custom fields are filled, likely a form submission
+                    return "Form Submission"
     
     # Check if specific form fields are present
-    form_indicator_fields = ["Revenue Model", "Last year's revenue", "Number of full time employees"]
-    if any(get_custom_field(lead_details, field) for field in form_indicator_fields):
+    if any(get_custom_field(lead_details, field) for field in FORM_INDICATOR_FIELDS):
         return "Form Submission"
     
     # If none of the above, it was likely manually added
@@ -433,6 +791,10 @@ def get_lead_source(lead_details):
 
 # Function to determine if a lead likely has form data
 def has_form_data(lead_details):
+    # Use the flag computed when the custom fields were indexed
+    if "_has_form_data" in lead_details:
+        return lead_details["_has_form_data"]
+    
     # Check if there are any non-empty custom fields
     custom_fields = lead_details.get("custom_fields", [])
     if not custom_fields:
@@ -452,15 +814,14 @@ def verify_copper_config():
     
     try:
         # Try to fetch a single lead to verify the connection
-        response = requests.get(
+        response = SESSION.get(
             f"{COPPER_API_URL}/leads/search",
-            headers=HEADERS,
             params={"page_size": 1},
             timeout=30
         )
         
         logger.info(f"Copper API Response Status: {response.status_code}")
-        logger.info(f"Copper API Response Headers: {response.headers}")
+        logger.debug("Copper API Response Headers: %s", response.headers)
         
         if response.status_code == 401:
             logger.error("Authentication failed with Copper API")
@@ -477,48 +838,19 @@ def verify_copper_config():
         logger.error(f"Unexpected error: {str(e)}")
         return False, f"Unexpected error: {str(e)}"
 
+# Callback for the rejection reason selectbox - store the new reason on the selected lead
+def on_reason_change(lead_id):
+    if lead_id in st.session_state.selected_leads:
+        st.session_state.selected_leads[lead_id]["reason"] = st.session_state[f"reason_{lead_id}"]
+
 # Main Streamlit app
 def main():
     # Initialize session state variables
     if "selected_leads" not in st.session_state:
         st.session_state.selected_leads = {}
     
-    if "email_cache" not in st.session_state:
-        st.session_state.email_cache = {}
-    
     # Custom CSS for better styling
-    st.markdown("""
-    <style>
-    .days-in-copper {
-        color: #FF4B4B;
-        font-weight: bold;
-    }
-    .form-submission {
-        color: #0068C9;
-        font-weight: bold;
-    }
-    .manual-entry {
-        color: #83C9FF;
-        font-weight: bold;
-    }
-    .lead-header {
-        font-size: 16px;
-        font-weight: bold;
-    }
-    .custom-field-name {
-        font-weight: bold;
-        color: #555555;
-    }
-    .custom-field-value {
-        margin-left: 10px;
-    }
-    .section-divider {
-        margin-top: 20px;
-        margin-bottom: 20px;
-        border-bottom: 1px solid #EEEEEE;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    _inject_css()
     
     st.title("Investment Pass Email Manager")
     
@@ -533,12 +865,15 @@ def main():
         
         if st.button("Fetch Custom Field Definitions from Copper"):
             with st.spinner("Fetching custom field definitions from Copper..."):
-                # Fetch custom field definitions directly from Copper API
-                response = requests.get(f"{COPPER_API_URL}/custom_field_definitions", headers=HEADERS)
-                
-                if response.status_code == 200:
-                    definitions = response.json()
-                    
+                # Fetch custom field definitions - this tool is for picking up names just changed in Copper,
+                # so drop the cached copies first; the fresh result then refills the cache the main view shares
+                fetch_custom_field_definitions.clear()
+                get_field_definition_names.clear()
+                try:
+                    definitions = fetch_custom_field_definitions()
+                except Exception as e:
+                    st.error(str(e))
+                else:
                     # Create a table of all definitions
                     fields_data = []
                     for definition in definitions:
@@ -573,8 +908,6 @@ def main():
                             st.success("Saved mapping to field_mapping.py")
                         except Exception as e:
                             st.error(f"Error saving mapping: {str(e)}")
-                else:
-                    st.error(f"Error fetching custom field definitions: {response.text}")
         
         # Return to main app
         st.write("---")
@@ -615,262 +948,198 @@ def main():
     # Add a refresh button
     if st.button("Refresh Leads"):
         # Clear caches on refresh
-        global LEAD_DETAILS_CACHE
-        LEAD_DETAILS_CACHE = {}
-        if 'email_cache' in st.session_state:
-            del st.session_state.email_cache
+        fetch_leads.clear()
+        fetch_lead_details.clear()
         st.rerun()
 
     # Fetch leads with error handling
-    leads_result = fetch_leads()
-    if isinstance(leads_result, dict) and "error" in leads_result:
-        st.error(f"Error fetching leads from Copper: {leads_result['error']}")
+    try:
+        leads = fetch_leads()
+    except Exception as e:
+        st.error(f"Error fetching leads from Copper: {str(e)}")
         return
     
-    leads = leads_result if isinstance(leads_result, list) else []
     if not leads:
         st.warning("No leads found in Copper CRM.")
         return
 
-    # Add search functionality
-    search_query = st.text_input("Search leads by name or company:", "")
+    # Add search functionality - inside a form so typing doesn't rerun the app until the search is submitted
+    with st.form("lead_search"):
+        search_query = st.text_input("Search leads by name or company:", "")
+        st.form_submit_button("Search")
     
     # Filter leads based on search query
     if search_query:
+        query = search_query.lower()
         filtered_leads = [
             lead for lead in leads 
-            if search_query.lower() in lead.get("name", "").lower() 
-            or search_query.lower() in lead.get("company_name", "").lower()
+            if query in lead.get("name", "").lower() 
+            or query in lead.get("company_name", "").lower()
         ]
     else:
         filtered_leads = leads
     
     st.write(f"### Showing {len(filtered_leads)} leads")
     
-    # Pre-fetch field definitions once
-    field_definitions = fetch_custom_field_definitions()
+    # Paginate so each rerun only prefetches and renders one page of leads
+    total_pages = max(1, -(-len(filtered_leads) // LEADS_PER_PAGE))
+    # A new search can leave fewer pages than the page number kept in session state
+    if st.session_state.get("lead_page", 1) > total_pages:
+        st.session_state.lead_page = total_pages
+    page = st.number_input("Page", min_value=1, max_value=total_pages, step=1, key="lead_page")
+    st.caption(f"Page {page} of {total_pages}")
+    page_leads = filtered_leads[(page - 1) * LEADS_PER_PAGE:page * LEADS_PER_PAGE]
     
-    # Create a mapping of form field names to their corresponding custom field definition IDs
-    field_id_mapping = {
-        "Number of full time employees": 328938,
-        "How did you hear about us?": 328940,
-        "Year Founded": 328941,
-        "Revenue Model": 328943,
-        "Last year's revenue": 328937,
-        "Amount raised to date": 328950,
-        "Target size of current raise": 328951,
-        "Link to your investor deck": 328958,
-        "Last three months' revenue": 328944,
-        "Value of new sales signed last month": 328946,
-        "Specific environmental impact": 328942,
-        "Number of paid customers": 328945,
-        "Cash on hand": 328948,
-        "Brief Company Description": 328956,  # This appears to be "Biggest concerns" now
-        "Monthly net burn": 328947,
-        "Most impressive points": 328954,
-        "Competitors": 328949,
-        "Most likely exit and timing": 328957,
-        "Biggest concerns": 328953
-    }
-
-    # Define the exact form fields to display in the specified order
-    field_order = [
-        "First Name",
-        "Last Name",
-        "Company Name",
-        "Website",
-        "Email",
-        "HQ Address",
-        "Country",
-        "Address Line 1",
-        "Address Line 2",
-        "City",
-        "Province",
-        "Postal Code",
-        "Year Founded", 
-        "Brief Company Description",
-        "How did you hear about us?",
-        "Specific environmental impact",
-        "Revenue Model",
-        "Last year's revenue",
-        "Last three months' revenue",
-        "Value of new sales signed last month",
-        "Number of full time employees",
-        "Number of paid customers",
-        "Cash on hand",
-        "Monthly net burn",
-        "Amount raised to date",
-        "Target size of current raise",
-        "Link to your investor deck"
-    ]
+    # Search results that already carry custom fields double as lead details
+    lead_details_by_id = {lead.get("id"): lead for lead in page_leads if "custom_fields" in lead}
     
-    # Lazy load lead details - only fetch when needed
-    for lead in filtered_leads:
+    # Prefetch details the bulk search didn't cover concurrently - each fetch is a blocking HTTPS round-trip.
+    # Worker threads get this script run's context so st.error() calls inside get_lead_details still render.
+    missing_lead_ids = [lead.get("id") for lead in page_leads if lead.get("id") not in lead_details_by_id]
+    if missing_lead_ids:
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=8,
+            initializer=add_script_run_ctx,
+            initargs=(None, get_script_run_ctx())
+        ) as executor:
+            # Failed lookups map to {} - get_lead_details has already reported the error
+            lead_details_by_id.update(zip(missing_lead_ids, executor.map(get_lead_details, missing_lead_ids)))
+    
+    # Render a collapsible section for each lead
+    now = time.time()
+    for lead in page_leads:
         lead_name = lead.get("name", "Unknown")
         company_name = lead.get("company_name", "Unknown Company")
         lead_id = lead.get("id")
         
         # Calculate days in Copper
-        days = days_in_copper(lead.get("date_created"))
+        days = days_in_copper(lead.get("date_created"), now)
         
-        # Check if we have form data without fetching full details
-        has_form_icon = ""
-        if lead_id in LEAD_DETAILS_CACHE:
-            lead_details = LEAD_DETAILS_CACHE[lead_id]
-            has_data = has_form_data(lead_details)
-            has_form_icon = "📝 " if has_data else ""
+        # Details were all prefetched above - fall back to the search record if the fetch failed
+        lead_details = lead_details_by_id[lead_id] or lead
         
-        # Create an expander for each lead
-        with st.expander(f"{has_form_icon}{lead_name} - {company_name} - {days} days in Copper"):
-            # Only fetch lead details when the expander is opened
-            lead_details = fetch_lead_details(lead_id)
-            
-            # Check for form data now that we have details
-            if not has_form_icon:
-                has_data = has_form_data(lead_details)
-                has_form_icon = "📝 " if has_data else ""
-            
-            # Determine source
-            source = get_lead_source(lead_details)
-            source_class = "form-submission" if source == "Form Submission" else "manual-entry"
-            
-            # Create columns for basic info
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.write(f"**Name:** {lead_details.get('name', 'Unknown')}")
-                st.write(f"**Company:** {lead_details.get('company_name', 'Unknown Company')}")
-                st.write(f"**Created:** {format_date(lead_details.get('date_created'))}")
-                st.write(f"**Days in Copper:** <span class='days-in-copper'>{days}</span>", unsafe_allow_html=True)
-                st.write(f"**Source:** <span class='{source_class}'>{source}</span>", unsafe_allow_html=True)
-            
-            with col2:
-                # Extract and display email more reliably
-                recipient_email = get_email_from_lead(lead_details)
-                st.write(f"**Email:** {recipient_email or 'No email provided'}")
-                
-                # Display additional details if available
-                if lead_details.get("phone_number"):
-                    st.write(f"**Phone:** {lead_details.get('phone_number')}")
-                
-                if lead_details.get("website"):
-                    st.write(f"**Website:** {lead_details.get('website')}")
+        # Check for form data once, now that we have details
+        has_form_icon = "📝 " if has_form_data(lead_details) else ""
+        
+        # Use a toggle button rather than st.expander, whose body runs on every rerun even when collapsed.
+        # Leads start collapsed unless they have an open email draft.
+        open_key = f"open_{lead_id}"
+        is_open = st.session_state.get(open_key, lead_id in st.session_state.selected_leads)
+        toggle_icon = "▼ " if is_open else "▶ "
+        if st.button(
+            f"{toggle_icon}{has_form_icon}{lead_name} - {company_name} - {days} days in Copper",
+            key=f"toggle_{lead_id}",
+            use_container_width=True
+        ):
+            st.session_state[open_key] = not is_open
+            st.rerun()
+        
+        # Only opened leads pay for building and rendering their details
+        if not is_open:
+            continue
+        
+        # Determine source
+        source = get_lead_source(lead_details)
+        source_class = "form-submission" if source == "Form Submission" else "manual-entry"
+        
+        # Build the basic info up front so the summary is sent as a single markdown element
+        basic_info = [
+            f"**Name:** {lead_details.get('name', 'Unknown')}",
+            f"**Company:** {lead_details.get('company_name', 'Unknown Company')}",
+            f"**Created:** {format_date(lead_details.get('date_created'))}",
+            f"**Days in Copper:** <span class='days-in-copper'>{days}</span>",
+            f"**Source:** <span class='{source_class}'>{source}</span>"
+        ]
+        
+        # Extract the email once - the draft section below reuses it as the recipient
+        recipient_email = get_email_from_lead(lead_details)
+        contact_info = [f"**Email:** {recipient_email or 'No email provided'}"]
+        
+        # Display additional details if available
+        if lead_details.get("phone_number"):
+            contact_info.append(f"**Phone:** {lead_details.get('phone_number')}")
+        
+        if lead_details.get("website"):
+            contact_info.append(f"**Website:** {lead_details.get('website')}")
+        
+        # Render the opened lead's details
+        with st.container(border=True):
+            # Show basic info and contact info side by side as one two-column markdown table
+            info_rows = ["| | |", "|---|---|"]
+            for left, right in itertools.zip_longest(basic_info, contact_info, fillvalue=""):
+                # Escape pipes in lead data so they don't split table cells
+                left = left.replace("|", "\\|")
+                right = right.replace("|", "\\|")
+                info_rows.append(f"| {left} | {right} |")
+            st.markdown("\n".join(info_rows), unsafe_allow_html=True)
             
             st.markdown("<div class='section-divider'></div>", unsafe_allow_html=True)
             
             # Display all custom fields in a comprehensive way
             st.write("### Form Details")
             
-            # Create a formatted display that matches the email notification format
-            st.markdown("""
-            <style>
-            .email-format {
-                font-family: Arial, sans-serif;
-                line-height: 1.5;
-                padding: 10px;
-                background-color: #f9f9f9;
-                border-radius: 5px;
-                border-left: 3px solid #0068C9;
-            }
-            .email-format p {
-                margin: 5px 0;
-            }
-            .email-label {
-                font-weight: bold;
-            }
-            </style>
-            """, unsafe_allow_html=True)
-            
-            # Start building the email-like format
-            email_content = f"""<div class="email-format">
-            <p>Sent via form submission from <a href="https://activeimpactinvestments.com">Active Impact Investments</a></p>
-            """
+            # Field values by definition ID - built once when the lead was fetched and indexed
+            if "_field_by_id" not in lead_details:
+                index_custom_fields(lead_details)
+            field_by_id = lead_details.get("_field_by_id", {})
             
-            # Create a dictionary to directly access fields by their definition ID
-            field_by_id = {}
-            for field in lead_details.get("custom_fields", []):
-                if isinstance(field, dict) and field.get("custom_field_definition_id"):
-                    field_def_id = field.get("custom_field_definition_id")
-                    
-                    # Use computed_value if available, otherwise fall back to value
-                    if "computed_value" in field:
-                        computed_value = field.get("computed_value")
-                        # If computed_value is a list, join it with commas
-                        if isinstance(computed_value, list):
-                            field_value = ", ".join(str(item) for item in computed_value)
-                        else:
-                            field_value = computed_value
-                    else:
-                        field_value = field.get("value", "")
-                    
-                    field_by_id[field_def_id] = field_value
-
-            # Add fields in the specified order - ONLY include fields from field_order list
-            for field_name in field_order:
-                value = "Not provided"
+            # Reuse the HTML built on an earlier rerun while the lead hasn't changed in Copper
+            html_key = f"form_html_{lead_id}"
+            fingerprint = (lead_details.get("date_modified"), len(field_by_id))
+            cached_html = st.session_state.get(html_key)
+            if fingerprint[0] is not None and cached_html and cached_html[0] == fingerprint:
+                email_content = cached_html[1]
+            else:
+                # Create a formatted display that matches the email notification format (styled by APP_CSS)
+                # Start building the email-like format - collect the pieces and join them once at the end
+                email_parts = [
+                    '<div class="email-format">',
+                    '<p>Sent via form submission from <a href="https://activeimpactinvestments.com">Active Impact Investments</a></p>'
+                ]
                 
-                # For standard fields, use the existing logic
-                if field_name in ["First Name", "Last Name", "Company Name", "Website", "Email", "HQ Address", "Country", 
-                                  "Address Line 1", "Address Line 2", "City", "Province", "Postal Code"]:
-                    if field_name == "First Name":
-                        value = lead_details.get("first_name", "Not provided")
-                    elif field_name == "Last Name":
-                        value = lead_details.get("last_name", "Not provided")
-                    elif field_name == "Company Name":
-                        value = lead_details.get("company_name", "Not provided")
-                    elif field_name == "Website":
-                        websites = lead_details.get("websites", [])
-                        if websites and len(websites) > 0:
-                            value = websites[0].get("url", "Not provided")
-                        else:
-                            value = "Not provided"
-                    elif field_name == "Email":
-                        value = get_email_from_lead(lead_details) or "Not provided"
-                    # Handle address fields
-                    elif field_name in ["HQ Address", "Country", "Address Line 1", "Address Line 2", "City", "Province", "Postal Code"]:
-                        address = lead_details.get("address", {})
-                        if field_name == "HQ Address":
-                            address_parts = []
-                            if address.get("street"):
-                                address_parts.append(address.get("street", ""))
-                            if address.get("city"):
-                                address_parts.append(address.get("city", ""))
-                            if address.get("state"):
-                                address_parts.append(address.get("state", ""))
-                            if address.get("postal_code"):
-                                address_parts.append(address.get("postal_code", ""))
-                            if address.get("country"):
-                                address_parts.append(address.get("country", ""))
-                            value = ", ".join(address_parts) if address_parts else "Not provided"
-                        elif field_name == "Country":
-                            value = address.get("country", "Not provided")
-                        elif field_name == "Address Line 1":
-                            value = address.get("street", "Not provided")
-                        elif field_name == "Address Line 2":
-                            value = "Not provided"  # Usually not in the API
-                        elif field_name == "City":
-                            value = address.get("city", "Not provided")
-                        elif field_name == "Province":
-                            value = address.get("state", "Not provided")
-                        elif field_name == "Postal Code":
-                            value = address.get("postal_code", "Not provided")
-                # For custom fields, use the ID mapping
-                elif field_name in field_id_mapping:
-                    field_id = field_id_mapping[field_name]
-                    if field_id in field_by_id and field_by_id[field_id] not in [None, ""]:
-                        value = field_by_id[field_id]
-                    else:
-                        # Debug logging to understand why field is missing
-                        logger.info(f"Field '{field_name}' (ID: {field_id}) not found in lead data")
+                # Read the address parts once for all the address fields
+                addr = lead_details.get("address") or {}
+                street, city, state, postal, country = (addr.get(key) for key in _ADDR_KEYS)
+                address_values = {
+                    "HQ Address": ", ".join([part for part in (street, city, state, postal, country) if part]),
+                    "Country": country,
+                    "Address Line 1": street,
+                    "Address Line 2": None,  # Usually not in the API
+                    "City": city,
+                    "Province": state,
+                    "Postal Code": postal
+                }
                 
-                # If value is still None or empty, show as not provided
-                if value is None or value == "":
+                # Add fields in the specified order - ONLY include fields from FIELD_ORDER list
+                for field_name in FIELD_ORDER:
                     value = "Not provided"
-                    
-                email_content += f"<p><span class='email-label'>{field_name}:</span> {value}</p>"
-            
-            # Close the form fields div
-            email_content += "</div>"
+                
+                    # For address fields, use the parts read above
+                    if field_name in address_values:
+                        value = address_values[field_name]
+                    # For standard fields, use the resolver for that field
+                    elif field_name in STD_FIELD_RESOLVERS:
+                        value = STD_FIELD_RESOLVERS[field_name](lead_details)
+                    # For custom fields, use the ID mapping
+                    elif field_name in FIELD_ID_MAPPING:
+                        field_id = FIELD_ID_MAPPING[field_name]
+                        field_value = field_by_id.get(field_id)
+                        if field_value is not None and field_value != "":
+                            value = field_value
+                        else:
+                            # Debug logging to understand why field is missing
+                            logger.info(f"Field '{field_name}' (ID: {field_id}) not found in lead data")
+                
+                    # If value is still None or empty, show as not provided
+                    if value is None or value == "":
+                        value = "Not provided"
+                
+                    email_parts.append(f"<p><span class='email-label'>{field_name}:</span> {value}</p>")
+                
+                # Close the form fields div
+                email_parts.append("</div>")
+                email_content = "".join(email_parts)
+                st.session_state[html_key] = (fingerprint, email_content)
             
             # Display the email-like format
             st.markdown(email_content, unsafe_allow_html=True)
@@ -880,30 +1149,23 @@ def main():
                 st.write("### Debug: Available Custom Fields")
                 st.write("This shows all available custom fields and their IDs for this lead.")
                 
-                custom_fields_debug = []
-                for field in lead_details.get("custom_fields", []):
-                    if isinstance(field, dict):
-                        field_id = field.get("custom_field_definition_id")
-                        field_name = field_definitions.get(field_id, "Unknown Field")
-                        
-                        # Get the field value
-                        if "computed_value" in field:
-                            computed_value = field.get("computed_value")
-                            if isinstance(computed_value, list):
-                                field_value = ", ".join(str(item) for item in computed_value)
-                            else:
-                                field_value = computed_value
-                        else:
-                            field_value = field.get("value", "")
-                            
-                        custom_fields_debug.append({
-                            "Field ID": field_id,
-                            "Field Name": field_name,
-                            "Value": field_value
-                        })
+                # Field definition names are only needed here, so load them on demand (shared cached map)
+                try:
+                    field_definitions = get_field_definition_names()
+                except Exception as e:
+                    st.error(str(e))
+                    field_definitions = {}
+                
+                # Reuse the display values indexed when the lead was fetched
+                custom_fields_debug = [
+                    (field_id, field_definitions.get(field_id, "Unknown Field"), field_value)
+                    for field_id, field_value in field_by_id.items()
+                ]
                 
                 if custom_fields_debug:
-                    st.table(custom_fields_debug)
+                    # One DataFrame for the whole table - st.dataframe serialises it through Arrow
+                    debug_df = pd.DataFrame.from_records(custom_fields_debug, columns=["Field ID", "Field Name", "Value"])
+                    st.dataframe(debug_df, use_container_width=True, hide_index=True)
                 else:
                     st.write("No custom fields found for this lead.")
             
@@ -915,7 +1177,7 @@ def main():
                 if lead_details.get("description"):
                     st.write(lead_details.get("description"))
             
-            # Close the current expander before creating a new one
+            # Separate the lead's details from the draft controls below
             st.markdown("<div class='section-divider'></div>", unsafe_allow_html=True)
             
             # Add a button to select this lead for email
@@ -935,113 +1197,116 @@ def main():
             
             # Check if this lead is selected for email drafting
             if "selected_leads" in st.session_state and lead_id in st.session_state.selected_leads:
-                # Display the email draft right here in the expander
+                # Display the email draft right here in the lead's container
                 st.write("### Draft Rejection Email")
             
-                # Rejection reason selection
-                reason_options = {
-                    "hardware": "Hardware (Pre-commercial or CapEx Intensive)",
-                    "too_early": "Too Early but Could Be a Future Fit",
-                    "geography": "Geography",
-                    "too_far_along": "Too Far Along",
-                    "not_enough_impact": "Not Enough Impact",
-                    "competitive": "Competitive with Portfolio Companies",
-                    "general": "General Pass"
-                }
-                
                 # Get the current reason from session state
                 current_reason = st.session_state.selected_leads[lead_id]["reason"]
                 
-                # Create a key that includes the current reason to force re-render when reason changes
-                select_key = f"reason_select_{lead_id}_{current_reason}"
-                
-                # Create the selectbox for rejection reasons
+                # Create the selectbox for rejection reasons - the stable key keeps the widget across reruns
+                # and the callback records a new reason before the rerun it triggers
                 selected_reason = st.selectbox(
                     "Select Rejection Reason",
-                    list(reason_options.keys()),
-                    format_func=lambda x: reason_options[x],
-                    index=list(reason_options.keys()).index(current_reason),
-                    key=select_key
+                    REASON_KEYS,
+                    format_func=REASON_OPTIONS.__getitem__,
+                    index=REASON_INDEX[current_reason],
+                    key=f"reason_{lead_id}",
+                    on_change=on_reason_change,
+                    args=(lead_id,)
                 )
                 
-                # Update the reason in session state if it changed
-                if selected_reason != current_reason:
-                    st.session_state.selected_leads[lead_id]["reason"] = selected_reason
-                    # Clear the email cache for this lead to force regeneration
-                    cache_key = f"{lead_id}_{current_reason}"
-                    if cache_key in st.session_state.email_cache:
-                        del st.session_state.email_cache[cache_key]
-                    # Force a rerun to update the UI with the new reason
-                    st.rerun()
-                
-                # Generate email content based on the selected reason
-                with st.spinner("Generating rejection email..."):
-                    email_content = generate_rejection_email(lead_details, selected_reason)
+                # Generate email content based on the selected reason (cached across reruns)
+                email_content = cached_rejection_email(
+                    selected_reason,
+                    lead_details.get("name", ""),
+                    lead_details.get("company_name", "")
+                )
                     
-                # Get recipient email more reliably
-                recipient_email = get_email_from_lead(lead_details)
-                
-                # Display recipient email for verification
+                # Display recipient email (resolved once at the top of this lead's render) for verification
                 st.write(f"**Sending to:** {recipient_email or 'No email found'}")
                 
                 # Create subject with pattern for Zapier to recognize
                 # Always use the same subject line as requested
                 email_subject = "Re: Active Impact Investments Form Submission"
                 
-                # Let user edit the subject
-                edited_subject = st.text_input("Email Subject:", email_subject, key=f"subject_{lead_id}")
-                
-                # Add CC option
-                cc_email = st.text_input("CC (optional):", "", key=f"cc_{lead_id}")
+                # Send submitted on an earlier run, if any - one send in flight per draft
+                send_key = f"send_future_{lead_id}"
+                pending_send = st.session_state.get(send_key)
+                sending = pending_send is not None and not pending_send["future"].done()
                 
-                # Let user edit the email content
-                edited_content = st.text_area("Edit Email Content:", email_content, height=300, key=f"content_{lead_id}")
+                # Edits are batched in a form so typing doesn't rerun the app until the email is sent
+                with st.form(f"email_form_{lead_id}", clear_on_submit=False):
+                    # Let user edit the subject
+                    edited_subject = st.text_input("Email Subject:", email_subject, key=f"subject_{lead_id}")
+                    
+                    # Add CC option
+                    cc_email = st.text_input("CC (optional):", "", key=f"cc_{lead_id}")
+                    
+                    # Let user edit the email content
+                    edited_content = st.text_area("Edit Email Content:", email_content, height=300, key=f"content_{lead_id}")
+                    
+                    # Send email button with confirmation
+                    submitted = st.form_submit_button("Send Email", disabled=sending)
                 
-                # Send email button with confirmation
-                if st.button("Send Email", key=f"send_{lead_id}"):
+                if submitted:
                     if not recipient_email:
                         st.error("No recipient email address found for this lead.")
                     elif not EMAIL_ADDRESS or not EMAIL_PASSWORD:
                         st.error("Email credentials not configured. Please check your Streamlit secrets.")
                     else:
-                        # First verify connection
-                        try:
-                            with st.spinner("Verifying email connection..."):
-                                server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-                                server.starttls()
-                                server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-                                server.quit()
-                                
-                            # If connection is successful, send the email
-                            with st.spinner("Sending email..."):
-                                success, message = send_email(recipient_email, edited_subject, edited_content, cc_email)
-                                
-                            if success:
-                                st.success(f"Email sent to {recipient_email}!")
-                                if cc_email:
-                                    st.success(f"CC'd to {cc_email}")
-                                st.info("Zapier will now automatically convert the lead to an opportunity in the Pass 'General' stage.")
-                                
-                                # Log the successful email for debugging
-                                logger.info(f"Email successfully sent to {recipient_email} with subject: {edited_subject}")
-                                if cc_email:
-                                    logger.info(f"CC'd to {cc_email}")
-                                
-                                # Remove this lead from selected leads after sending
-                                del st.session_state.selected_leads[lead_id]
-                            else:
-                                st.error(message)
-                                st.info("Please check the logs for more details on the error.")
-                        except Exception as e:
-                            st.error(f"Failed to connect to email server: {str(e)}")
-                            logger.error(f"Email connection failed during send attempt: {str(e)}")
+                        # Hand the send to the pool and rerun straight away - the result is picked up on a later run
+                        future = get_send_pool().submit(
+                            send_email_with_client, get_smtp_client(),
+                            recipient_email, edited_subject, edited_content, cc_email
+                        )
+                        st.session_state[send_key] = {
+                            "future": future,
+                            "recipient": recipient_email,
+                            "subject": edited_subject,
+                            "cc": cc_email
+                        }
+                        st.rerun()
+                elif sending:
+                    # No auto-polling - the result shows on the next interaction, or on "Check status"
+                    st.info(f"Sending email to {pending_send['recipient']}...")
+                    st.button("Check status", key=f"check_send_{lead_id}")
+                    if st.button("Cancel send", key=f"cancel_send_{lead_id}"):
+                        # Only a send still waiting for a pool thread can be cancelled
+                        if pending_send["future"].cancel():
+                            del st.session_state[send_key]
+                            st.rerun()
+                        else:
+                            st.warning("The email is already being sent and can no longer be cancelled.")
+                elif pending_send is not None:
+                    del st.session_state[send_key]
+                    success, message = pending_send["future"].result()
+                    if success:
+                        st.success(f"Email sent to {pending_send['recipient']}!")
+                        if pending_send["cc"]:
+                            st.success(f"CC'd to {pending_send['cc']}")
+                        st.info("Zapier will now automatically convert the lead to an opportunity in the Pass 'General' stage.")
+                        
+                        # Log the successful email for debugging
+                        logger.info(f"Email successfully sent to {pending_send['recipient']} with subject: {pending_send['subject']}")
+                        if pending_send["cc"]:
+                            logger.info(f"CC'd to {pending_send['cc']}")
+                        
+                        # Remove this lead from selected leads after sending
+                        del st.session_state.selected_leads[lead_id]
+                    else:
+                        st.error(message)
+                        st.info("Please check the logs for more details on the error.")
                 
-                # Add a cancel button to close the email draft
-                if st.button("Cancel", key=f"cancel_{lead_id}"):
+                # Add a cancel button to close the email draft - outside the form so it reruns immediately.
+                # Disabled while a send is in flight (closing the draft wouldn't stop it - use "Cancel send"),
+                # so a draft is never closed with its send unsettled.
+                if st.button("Cancel", key=f"cancel_{lead_id}", disabled=sending):
                     del st.session_state.selected_leads[lead_id]
+                    # Any finished send was shown and cleared above; drop the key so a new draft starts clean
+                    st.session_state.pop(send_key, None)
                     st.rerun()
         
-        # End of the lead expander
+        # End of the lead section
 
 if __name__ == "__main__":
     main()